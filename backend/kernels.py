@@ -0,0 +1,130 @@
+"""
+Numeric kernels for the weather risk analysis
+Uses, in order of preference: the ahead-of-time compiled _kernels_aot extension
+(built by kernels_aot.py), Numba JIT when it is installed, otherwise plain NumPy
+"""
+
+import os
+
+import numpy as np
+
+# Set KERNELS_AOT=0 to ignore a built extension (kernels_aot.py does this while building)
+AOT_AVAILABLE = False
+if os.getenv("KERNELS_AOT", "1") != "0":
+    try:
+        import _kernels_aot
+        AOT_AVAILABLE = True
+    except ImportError:
+        pass
+
+# Numba is only imported when there is no AOT build, so its import and JIT
+# compilation stay off the cold start path
+NUMBA_AVAILABLE = False
+if not AOT_AVAILABLE:
+    try:
+        from numba import njit
+        NUMBA_AVAILABLE = True
+    except ImportError:
+        pass
+
+MIN_SAMPLES = 10     # fewer window samples than this -> no trend
+MIN_YEARS = 3        # fewer distinct years than this -> no trend
+MAX_SLOPE = 1000.0   # clamp to avoid overflow on degenerate data
+
+
+def _trend_slope_numpy(years: np.ndarray, values: np.ndarray) -> float:
+    """Least-squares slope of the yearly means of values (NumPy version)"""
+    if len(values) < MIN_SAMPLES:
+        return 0.0
+
+    unique_years, year_index = np.unique(years, return_inverse=True)
+    if len(unique_years) < MIN_YEARS:
+        return 0.0
+
+    x = unique_years.astype(np.float64)
+    y = np.bincount(year_index, weights=values) / np.bincount(year_index)
+
+    n = len(x)
+    denominator = n * np.sum(x ** 2) - np.sum(x) ** 2
+    if abs(denominator) < 1e-10:  # Avoid division by zero
+        return 0.0
+
+    slope = (n * np.sum(x * y) - np.sum(x) * np.sum(y)) / denominator
+    return float(np.clip(slope, -MAX_SLOPE, MAX_SLOPE))
+
+
+def _trend_slopes_numpy(years: np.ndarray, values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Trend slope of each row of values over its valid samples (NumPy version)"""
+    return np.array([_trend_slope_numpy(years[mask], row[mask]) for row, mask in zip(values, valid)])
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _binned_slope(first_year, counts, sums):
+        """Least-squares slope through the per-year means of pre-binned sums"""
+        n = 0
+        sum_x = 0.0
+        sum_y = 0.0
+        sum_xy = 0.0
+        sum_x2 = 0.0
+        for b in range(len(counts)):
+            if counts[b] == 0:
+                continue
+            x = float(first_year + b)
+            y = sums[b] / counts[b]
+            n += 1
+            sum_x += x
+            sum_y += y
+            sum_xy += x * y
+            sum_x2 += x * x
+
+        if n < MIN_YEARS:
+            return 0.0
+
+        denominator = n * sum_x2 - sum_x ** 2
+        if abs(denominator) < 1e-10:  # Avoid division by zero
+            return 0.0
+
+        slope = (n * sum_xy - sum_x * sum_y) / denominator
+        return min(max(slope, -MAX_SLOPE), MAX_SLOPE)
+
+    @njit(cache=True, fastmath=True)
+    def _trend_slopes_jit(years, values, valid):
+        """Trend slope of each row of values over its valid samples (single pass binning per row)"""
+        n_rows, width = values.shape
+        slopes = np.zeros(n_rows, dtype=np.float64)
+        if width == 0:
+            return slopes
+
+        # Rows share the window's years, so one set of bins is reused for every row
+        first_year = years.min()
+        n_bins = years.max() - first_year + 1
+        counts = np.zeros(n_bins, dtype=np.int64)
+        sums = np.zeros(n_bins, dtype=np.float64)
+        for r in range(n_rows):
+            counts[:] = 0
+            sums[:] = 0.0
+            n_samples = 0
+            for i in range(width):
+                if valid[r, i]:
+                    b = years[i] - first_year
+                    counts[b] += 1
+                    sums[b] += values[r, i]
+                    n_samples += 1
+            if n_samples >= MIN_SAMPLES:
+                slopes[r] = _binned_slope(first_year, counts, sums)
+        return slopes
+
+    trend_slopes = _trend_slopes_jit
+elif AOT_AVAILABLE:
+    # The extension is built for the window tensor's dtypes (int16 years, float64 values, bool mask)
+    def _trend_slopes_aot(years: np.ndarray, values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """Trend slope of each row of values over its valid samples"""
+        return _kernels_aot.trend_slopes(
+            np.asarray(years, dtype=np.int16),
+            np.ascontiguousarray(values, dtype=np.float64),
+            np.ascontiguousarray(valid, dtype=np.bool_)
+        )
+    trend_slopes = _trend_slopes_aot
+else:
+    trend_slopes = _trend_slopes_numpy
@@ -0,0 +1,33 @@
+"""
+Ahead-of-time build of the Numba kernel in kernels.py
+Run at build time (python backend/kernels_aot.py, needs numba and a C compiler) to
+produce the _kernels_aot extension next to this file. kernels.py then loads it
+instead of importing Numba and JIT compiling on the first request.
+"""
+
+import os
+import sys
+
+# Compile from the JIT definitions even if an older extension is already built
+os.environ["KERNELS_AOT"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from numba.pycc import CC
+
+from kernels import NUMBA_AVAILABLE
+
+if not NUMBA_AVAILABLE:
+    raise SystemExit("numba is required to build the _kernels_aot extension")
+
+from kernels import _trend_slopes_jit
+
+cc = CC("_kernels_aot")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Signature matches the window tensor (int16 years, float64 value rows, bool valid mask)
+cc.export("trend_slopes", "f8[:](i2[:], f8[:, :], b1[:, :])")(_trend_slopes_jit.py_func)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"Built {cc.name} in {cc.output_dir}")
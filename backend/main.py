@@ -3,42 +3,66 @@ Will It Rain On My Parade? - NASA Space Apps Challenge 2025
 Backend API for weather risk analysis using NASA datasets
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.datastructures import Default
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field, FiniteFloat
+from typing import List, Dict, Optional, Any, Tuple, Callable
 import numpy as np
-import pandas as pd
 import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import functools
+import importlib.util
+import zlib
 from datetime import datetime, timedelta
 import logging
+import orjson
 import os
 from dotenv import load_dotenv
-import xarray as xr
 
-# Load environment variables
-load_dotenv()
+# Sibling modules (kernels, nasa_integration) are imported by their top-level names, so
+# backend/ must be on the import path; fail here rather than on every provider-backed request
+if importlib.util.find_spec("kernels") is None:
+    raise ImportError("backend/ is not on the import path; set PYTHONPATH=backend or start uvicorn with --app-dir backend")
 
 # Load environment variables
 load_dotenv()
 
-# Import NASA integration
-NASA_INTEGRATION_AVAILABLE = False
-try:
-    from nasa_integration import NASADataIntegration
-    NASA_INTEGRATION_AVAILABLE = True
-    print("✅ NASA integration module loaded successfully")
-except ImportError as e:
-    print(f"⚠️  NASA integration not available: {e}")
-    print("   Continuing with simulated data only")
-except Exception as e:
-    print(f"⚠️  NASA integration error: {e}")
-    print("   Continuing with simulated data only")
+# Logging (level from LOG_LEVEL, INFO by default)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Consumer task for /analyze request batching
+    analysis_batcher.start()
+    yield
+    await analysis_batcher.stop()
+
+# FastAPI releases that deprecate ORJSONResponse serialize response models straight to JSON
+# bytes with Pydantic, which is much faster than jsonable_encoder + orjson but only applies to
+# the default response class; older releases still go through jsonable_encoder, so use orjson there
+PYDANTIC_JSON_RESPONSES = getattr(ORJSONResponse, "__deprecated__", None) is not None
+
+class OrjsonContentResponse(JSONResponse):
+    """JSON response for plain content rendered with orjson (NaN/Infinity become null)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
 
 app = FastAPI(
     title="Will It Rain On My Parade?",
     description="NASA weather risk analysis API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=Default(JSONResponse) if PYDANTIC_JSON_RESPONSES else ORJSONResponse
 )
 
 # Enable CORS for frontend
@@ -64,6 +88,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # Rejected NaN/Infinity inputs are echoed in the errors; orjson writes them as null
+    # where the stdlib encoder of the default handler would fail with a 500
+    return OrjsonContentResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
 # Simple geocoding proxy to avoid browser CORS
 import httpx
 
@@ -162,19 +192,22 @@ async def proxy_meteomatics_weather(timestamp: str, params: str, coordinates: st
 
 # Pydantic models
 class LocationRequest(BaseModel):
-    latitude: float
-    longitude: float
+    # NaN/Infinity are valid JSON to FastAPI, so coordinates are checked up front
+    latitude: float = Field(ge=-90, le=90, allow_inf_nan=False)
+    longitude: FiniteFloat  # not range-checked: map widgets can report wrapped longitudes
     event_date: str  # ISO format: "2025-07-04"
-    thresholds: Dict[str, float] = {
+    thresholds: Dict[str, float] = Field(default_factory=lambda: {
         "hot_temp": 32.0,
         "cold_temp": 0.0,
         "precipitation": 5.0,
         "wind_speed": 15.0
-    }
-    area_radius_km: Optional[float] = 0.0  # optional circular area around point
-    polygon: Optional[List[Dict[str, float]]] = None  # optional polygon [[lat,lng], ...]
+    })
+    area_radius_km: Optional[FiniteFloat] = 0.0  # optional circular area around point
+    polygon: Optional[List[Dict[str, FiniteFloat]]] = None  # optional polygon [[lat,lng], ...]
 
 class WeatherProbability(BaseModel):
+    model_config = ConfigDict(extra='forbid', frozen=True)
+    
     condition: str
     probability: float
     threshold: str
@@ -185,14 +218,221 @@ class WeatherProbability(BaseModel):
     p_value: float
 
 class WeatherAnalysisResponse(BaseModel):
+    model_config = ConfigDict(extra='forbid', frozen=True)
+    
     location: Dict[str, float]
     event_date: str
     comfort_index: int
     probabilities: List[WeatherProbability]
     alternative_dates: List[Dict[str, Any]]
     metadata: Dict[str, Any]
-    alternative_dates: List[Dict[str, Any]]
-    metadata: Dict[str, Any]
+
+# Daily calendar shared by every historical series
+# Month/day/year are computed once here; each series only carries its values
+# (NaN where a provider has no data) plus references to these arrays.
+# The smallest integer types that hold them keep the window filters' memory traffic low.
+HISTORY_DATES = np.arange(np.datetime64('1990-01-01'), np.datetime64('2025-01-01'), np.timedelta64(1, 'D'))
+_HISTORY_MONTHS = HISTORY_DATES.astype('datetime64[M]')
+_HISTORY_YEARS = HISTORY_DATES.astype('datetime64[Y]')
+HISTORY_MONTH = (_HISTORY_MONTHS.astype(np.int64) % 12 + 1).astype(np.int8)
+HISTORY_DAY = ((HISTORY_DATES - _HISTORY_MONTHS).astype(np.int64) + 1).astype(np.int8)
+HISTORY_YEAR = (_HISTORY_YEARS.astype(np.int64) + 1970).astype(np.int16)
+HISTORY_DOY = (HISTORY_DATES - _HISTORY_YEARS).astype(np.int64) + 1
+WINDOW_DAYS = 7  # ±7 days around the requested month/day
+HISTORY_VARIABLES = ("temperature", "precipitation", "wind_speed", "air_quality", "cloud_cover", "snow_depth", "dust")
+
+# Row indices of each (month, day) window, filled lazily on first use
+_MONTH_DAY_INDEX: Dict[Tuple[int, int], np.ndarray] = {}
+
+@dataclass(frozen=True, eq=False)
+class HistoricalSeries:
+    """Daily values and their calendar stored as parallel arrays"""
+    values: np.ndarray
+    year: np.ndarray
+    month: np.ndarray
+    day: np.ndarray
+    window_index: Dict[Tuple[int, int], np.ndarray]  # shared by series on the same calendar
+
+    def window_rows(self, month: int, day: int) -> np.ndarray:
+        """Row indices of the ±WINDOW_DAYS window of month/day (missing days included)"""
+        idx = self.window_index.get((month, day))
+        if idx is None:
+            # int8 day differences stay within ±30, so no widening is needed
+            idx = np.flatnonzero((self.month == month) & (np.abs(self.day - day) <= WINDOW_DAYS))
+            self.window_index[(month, day)] = idx
+        return idx
+
+# Live conditions plus one historical series per variable for a location
+LocationInputs = Tuple[Dict[str, Any], Dict[str, HistoricalSeries]]
+
+def _series(values: np.ndarray) -> HistoricalSeries:
+    """Wrap daily values aligned with HISTORY_DATES as a historical series"""
+    return HistoricalSeries(values, HISTORY_YEAR, HISTORY_MONTH, HISTORY_DAY, _MONTH_DAY_INDEX)
+
+def _series_from_points(dates: Any, values: Any) -> HistoricalSeries:
+    """
+    Align provider (date, value) points onto HISTORY_DATES.
+    Points on the same day are averaged; days without data become NaN.
+    """
+    n = len(HISTORY_DATES)
+    offsets = (np.asarray(dates).astype('datetime64[D]') - HISTORY_DATES[0]).astype(np.int64)
+    points = np.asarray(values, dtype=np.float64)
+    keep = (offsets >= 0) & (offsets < n) & ~np.isnan(points)
+    counts = np.bincount(offsets[keep], minlength=n)
+    sums = np.bincount(offsets[keep], weights=points[keep], minlength=n)
+    with np.errstate(invalid='ignore'):
+        daily = sums / counts
+    daily.setflags(write=False)
+    return _series(daily)
+
+def _series_from_frame(df: Any, variable: str) -> HistoricalSeries:
+    """Align a nasa_integration DataFrame (date + variable/value columns) onto HISTORY_DATES"""
+    column = variable if variable in df.columns else 'value'
+    return _series_from_points(df['date'].to_numpy(), df[column].to_numpy())
+
+# Simulated climatology cache
+# The simulated series depend only on the grid cell and variable, so each one is
+# built once and the read-only values are shared across requests.
+SIM_GRID_DEG = 0.25
+
+# Seasonal cycles over HISTORY_DATES, shared by every simulated build
+_SEASONAL_TEMP = 15 * np.sin(2 * np.pi * (HISTORY_DOY - 81) / 365)
+_SEASONAL_MONSOON = 1 + np.sin(2 * np.pi * (HISTORY_DOY - 150) / 365)
+_SEASONAL_WIND = 1 + 0.5 * np.sin(2 * np.pi * (HISTORY_DOY - 365) / 365)
+_SEASONAL_POLLUTION = 1 + 0.3 * np.sin(2 * np.pi * (HISTORY_DOY - 200) / 365)  # Winter pollution
+_NORTHERN_WINTER = (HISTORY_MONTH <= 3) | (HISTORY_MONTH == 12)
+_SOUTHERN_WINTER = (HISTORY_MONTH >= 6) & (HISTORY_MONTH <= 9)
+
+def _quantize(coord: float) -> float:
+    """Snap a coordinate to the simulation grid"""
+    return round(round(coord / SIM_GRID_DEG) * SIM_GRID_DEG, 2)
+
+@functools.lru_cache(maxsize=512)
+def _build_sim(lat: float, lon: float, variable: str) -> np.ndarray:
+    """
+    Build simulated daily values (aligned with HISTORY_DATES) for a grid cell.
+    Seeded from the cache key so cached and freshly built series match.
+    """
+    # zlib.crc32 instead of hash(): str hashes are salted per process
+    rng = np.random.default_rng(zlib.crc32(f"{lat:.2f},{lon:.2f},{variable}".encode()))
+    n = len(HISTORY_DATES)
+    latitude_factor = np.abs(lat) / 90.0
+    
+    if variable == "temperature":
+        # Temperature simulation with seasonal cycle
+        base_temp = 20 - (latitude_factor * 25)  # Warmer near equator
+        values = base_temp + _SEASONAL_TEMP + rng.normal(0, 5, n)
+        
+    elif variable == "precipitation":
+        # Precipitation with monsoon patterns
+        monsoon_factor = _SEASONAL_MONSOON * 2 if lat < 30 else _SEASONAL_MONSOON  # Tropical regions
+        values = np.maximum(0, rng.exponential(2, n) * monsoon_factor)
+        
+    elif variable == "wind_speed":
+        # Wind speed with seasonal patterns
+        winter_boost = _SEASONAL_WIND * 1.5 if latitude_factor > 0.5 else _SEASONAL_WIND  # Higher latitudes windier
+        values = rng.gamma(2.0, 3.0, n) * winter_boost
+        
+    elif variable == "snow_depth":
+        # Snow depth depends strongly on latitude and season
+        if np.abs(lat) < 25:
+            # Minimal or zero snow for tropics/subtropics
+            values = np.zeros(n)
+        else:
+            # Define winter months by hemisphere
+            winter_mask = _NORTHERN_WINTER if lat >= 0 else _SOUTHERN_WINTER
+            # Base potential snow only at higher latitudes
+            high_lat_factor = np.clip((np.abs(lat) - 35) / 25, 0, 1)  # 0 below 35°, 1 above 60°
+            values = np.where(winter_mask, rng.gamma(1.5, 1.5, n) * 5 * high_lat_factor, 0.0)
+        
+    elif variable == "air_quality":
+        # Air quality simulation (PM2.5 equivalent)
+        # Higher pollution in urban areas and during certain seasons
+        urban_factor = 1.5 if abs(lat) < 40 and abs(lon) < 100 else 1.0  # Urban areas
+        base_pollution = rng.gamma(1.5, 8.0, n) * urban_factor * _SEASONAL_POLLUTION
+        values = np.maximum(5, base_pollution)  # Minimum 5 μg/m³
+        
+    else:
+        values = rng.normal(10, 3, n)
+    
+    values.setflags(write=False)
+    return values
+
+NASA_DATASETS = {
+    "MERRA-2": "Temperature, Wind Speed, Air Quality",
+    "GPM_IMERG": "Precipitation",
+    "years_available": "1990-2024"
+}
+
+# Comfort index weights
+# Enhanced weights based on PRD requirements for "Very Uncomfortable" conditions
+COMFORT_WEIGHTS = {
+    'Very Hot': 0.30,      # High weight for extreme heat
+    'Very Cold': 0.20,     # Moderate weight for cold
+    'Heavy Rain': 0.25,    # High weight for precipitation
+    'Strong Wind': 0.10,   # Lower weight for wind
+    'Poor Air Quality': 0.10,  # Air quality impact
+    'High Humidity': 0.05  # Additional factor for humidity
+}
+DEFAULT_COMFORT_WEIGHT = 0.05  # Default weight for unknown conditions
+
+# Conditions in the order calculate_probabilities reports them, with their weights as a vector
+COMFORT_CONDITIONS = ("Very Hot", "Very Cold", "Heavy Rain", "Strong Wind", "Poor Air Quality", "Cloudy Day", "Snow Depth", "Dust Concentration")
+COMFORT_WEIGHT_VECTOR = np.array([COMFORT_WEIGHTS.get(c, DEFAULT_COMFORT_WEIGHT) for c in COMFORT_CONDITIONS])
+
+# Series, threshold key/default and comparison sign behind each of COMFORT_CONDITIONS
+# (sign -1 turns "below threshold" into "above" so every condition is one comparison)
+CONDITION_VARIABLES = ("temperature", "temperature", "precipitation", "wind_speed", "air_quality", "cloud_cover", "snow_depth", "dust")
+CONDITION_THRESHOLDS = (("hot_temp", None), ("cold_temp", None), ("precipitation", None), ("wind_speed", None),
+                        ("air_quality", 25.0), ("cloud_cover", 70.0), ("snow_depth", 5.0), ("dust", 0.2))
+CONDITION_SIGNS = np.array([1.0, -1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0])
+
+ALTERNATIVE_DATE_OFFSETS = (-14, -7, 7, 14)  # days around the event date checked for alternatives
+
+def _window_matrix(series: Dict[str, HistoricalSeries], dates: List[datetime], thresholds: Dict,
+                   trend_slopes: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Historical probability (percent) and mean of every COMFORT_CONDITIONS entry at each date,
+    each shape (n_dates, n_conditions), plus the trend slope of every condition at dates[0],
+    shape (n_conditions,), all computed from one padded window tensor
+    """
+    limits = np.array([thresholds[key] if default is None else thresholds.get(key, default)
+                       for key, default in CONDITION_THRESHOLDS]) * CONDITION_SIGNS
+    
+    # (n_dates, width) row matrix; windows shorter than the widest are padded and masked out
+    rows = [series[CONDITION_VARIABLES[0]].window_rows(d.month, d.day) for d in dates]
+    width = max(len(r) for r in rows)
+    index = np.zeros((len(rows), width), dtype=np.intp)
+    in_window = np.zeros((len(rows), width), dtype=bool)
+    for i, r in enumerate(rows):
+        index[i, :len(r)] = r
+        in_window[i, :len(r)] = True
+    
+    # (n_dates, n_conditions, width)
+    values = np.stack([series[v].values[index] for v in CONDITION_VARIABLES], axis=1)
+    valid = in_window[:, None, :] & ~np.isnan(values)
+    counts = valid.sum(axis=2)
+    exceed = ((values * CONDITION_SIGNS[:, None] > limits[:, None]) & valid).sum(axis=2)
+    # A condition with no valid samples in a window (e.g. a gap in the fetched series) has no
+    # observed exceedance; report 0 instead of NaN so the comfort index and the response stay finite
+    sampled = counts > 0
+    probs = np.divide(exceed * 100, counts, out=np.zeros(counts.shape), where=sampled)
+    means = np.divide(np.where(valid, values, 0.0).sum(axis=2), counts, out=np.zeros(counts.shape), where=sampled)
+    # Trends are only reported for the first date; its tensor row and mask feed the kernel directly
+    slopes = trend_slopes(series[CONDITION_VARIABLES[0]].year[index[0]], values[0], valid[0])
+    return probs, means, slopes
+
+def _comfort_index(probs: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Comfort index (0-100) from probabilities in percent along the last axis.
+    Leading axes are kept, so several dates can be scored at once.
+    """
+    scaled = probs / 100
+    # Apply non-linear scaling: penalize high probabilities more heavily
+    scaled = np.where(scaled > 0.5, scaled ** 1.5, scaled)
+    # Weighted discomfort normalized by total weight; higher discomfort = lower comfort
+    discomfort = scaled @ weights / weights.sum()
+    return np.clip(np.round((1 - discomfort) * 100), 0, 100).astype(np.int64)
 
 # NASA Data Integration
 class NASADataProvider:
@@ -201,31 +441,42 @@ class NASADataProvider:
     """
     
     def __init__(self):
-        self.datasets = {
-            "MERRA-2": "Temperature, Wind Speed, Air Quality",
-            "GPM_IMERG": "Precipitation",
-            "years_available": "1990-2024"
-        }
+        self.datasets = NASA_DATASETS
+        
+        # Heavy modules are imported on first use rather than at module load,
+        # so a cold start serving only / or /health never pays for them
+        from kernels import trend_slopes
+        self._trend_slopes = trend_slopes
+        
+        # Import NASA integration (pulls in pandas/xarray)
+        self.integration_available = False
+        try:
+            from nasa_integration import NASADataIntegration
+            self.integration_available = True
+            logger.info("✅ NASA integration module loaded successfully")
+        except ImportError as e:
+            logger.warning("⚠️  NASA integration not available: %s; continuing with simulated data only", e)
+        except Exception as e:
+            logger.warning("⚠️  NASA integration error: %s; continuing with simulated data only", e)
         
         # Initialize NASA integration if available
         self.use_real_nasa_data = False
         self.nasa_api = None
         
-        if NASA_INTEGRATION_AVAILABLE:
+        if self.integration_available:
             try:
                 self.nasa_api = NASADataIntegration()
                 self.use_real_nasa_data = self.nasa_api.use_real_nasa_data
                 if self.use_real_nasa_data:
-                    print("🚀 Real NASA data integration enabled!")
+                    logger.info("🚀 Real NASA data integration enabled!")
                 else:
-                    print("🔬 Using simulated data (NASA credentials not found)")
+                    logger.info("🔬 Using simulated data (NASA credentials not found)")
             except Exception as e:
-                print(f"⚠️  NASA integration initialization failed: {e}")
-                print("   Falling back to simulated data")
+                logger.warning("⚠️  NASA integration initialization failed: %s; falling back to simulated data", e)
                 self.use_real_nasa_data = False
                 self.nasa_api = None
         else:
-            print("🔬 NASA integration not available, using simulated data")
+            logger.info("🔬 NASA integration not available, using simulated data")
         
         # OPeNDAP config via env
         self.opendap_url = os.getenv("OPENDAP_URL", "")
@@ -235,9 +486,9 @@ class NASADataProvider:
         self.opendap_var_aod = os.getenv("OPENDAP_VAR_AOD", "AODANA")   # Aerosol optical depth
         self.opendap_var_snow = os.getenv("OPENDAP_VAR_SNOW", "snowc")  # Snow cover
     
-    async def get_historical_data(self, lat: float, lon: float, variable: str) -> pd.DataFrame:
+    async def get_historical_data(self, lat: float, lon: float, variable: str) -> HistoricalSeries:
         """
-        Get historical data for a location and variable.
+        Get historical data for a location and variable as a series aligned with HISTORY_DATES.
         Prefer NASA POWER (no auth) for temperature, precipitation, wind; fallback to simulation.
         If nasa_integration module is available, that path can still be enabled via env.
         """
@@ -285,14 +536,10 @@ class NASADataProvider:
                                         v = rec.get("value")
                                         if t is None or v is None:
                                             continue
-                                        times.append(pd.to_datetime(t))
+                                        times.append(t[:10])  # UTC day
                                         series.append(float(v))
                                 if times:
-                                    df = pd.DataFrame({"date": times, "value": series})
-                                    # normalize canonical column name
-                                    df[variable] = df["value"]
-                                    df.sort_values("date", inplace=True)
-                                    return df
+                                    return _series_from_points(times, series)
                             # If 4xx/5xx -> fall through to other sources
         except Exception as _e:
             pass
@@ -327,12 +574,10 @@ class NASADataProvider:
                                         v = rec.get("value")
                                         if t is None or v is None:
                                             continue
-                                        times.append(pd.to_datetime(t))
+                                        times.append(t[:10])  # UTC day
                                         series.append(float(v))
                                 if times:
-                                    df = pd.DataFrame({"date": times, "value": series, "dust": series})
-                                    df.sort_values("date", inplace=True)
-                                    return df
+                                    return _series_from_points(times, series)
                             # 400 → fallback will kick in
         except Exception as _e:
             # Continue to other providers
@@ -341,27 +586,29 @@ class NASADataProvider:
         if self.use_real_nasa_data and self.nasa_api:
             try:
                 if variable == "temperature":
-                    print(f"🌡️  Fetching real MERRA-2 temperature data for {lat}, {lon}")
-                    return await self.nasa_api.get_temperature_data(lat, lon, 1990, 2024)
+                    logger.debug("🌡️  Fetching real MERRA-2 temperature data for %s, %s", lat, lon)
+                    df = await self.nasa_api.get_temperature_data(lat, lon, 1990, 2024)
+                    return _series_from_frame(df, variable)
                 elif variable == "precipitation":
-                    print(f"🌧️  Fetching real GPM IMERG precipitation data for {lat}, {lon}")
-                    return await self.nasa_api.get_precipitation_data(lat, lon, 1997, 2024)
+                    logger.debug("🌧️  Fetching real GPM IMERG precipitation data for %s, %s", lat, lon)
+                    df = await self.nasa_api.get_precipitation_data(lat, lon, 1997, 2024)
+                    return _series_from_frame(df, variable)
                 elif variable == "cloud_cover":
-                    print(f"☁️  Fetching real cloud cover via OPeNDAP (stub)")
+                    logger.debug("☁️  Fetching real cloud cover via OPeNDAP (stub)")
                     # TODO: implement using xarray + OPeNDAP; for now, fallback continues
                     raise RuntimeError("Cloud cover OPeNDAP not yet wired")
             except Exception as e:
-                print(f"⚠️  NASA (xarray) integration failed for {variable}: {e}")
-                print("   Will try NASA POWER API next")
+                logger.warning("⚠️  NASA (xarray) integration failed for %s: %s; will try NASA POWER API next", variable, e)
 
         # 2) Try OPeNDAP via xarray if enabled for certain variables
         try:
             if self.opendap_enabled and variable in ("cloud_cover", "dust", "snow_depth"):
-                print(f"🛰️  Fetching {variable} via OPeNDAP: {self.opendap_url}")
+                logger.debug("🛰️  Fetching %s via OPeNDAP: %s", variable, self.opendap_url)
                 # Open dataset lazily via xarray
                 # Guard against misconfiguration where OPENDAP_URL is a local path or blocked resource
                 if not self.opendap_enabled:
                     raise RuntimeError("OPENDAP disabled or invalid URL; set OPENDAP_URL to an http(s) OPeNDAP endpoint")
+                import xarray as xr
                 ds = xr.open_dataset(self.opendap_url)
                 if variable == "cloud_cover":
                     v = self.opendap_var_cloud
@@ -384,22 +631,18 @@ class NASADataProvider:
                 # Select nearest
                 point = da.sel({lat_name: lat, lon_name: lon}, method='nearest')
                 # Load time series
-                ts = point.to_series()
-                df = ts.reset_index()
-                df.rename(columns={time_name: 'date', 0: 'value'}, inplace=True)
-                df['date'] = pd.to_datetime(df['date'])
-                df = df[['date', 'value']].dropna()
+                times = point[time_name].values
+                values = np.asarray(point.values, dtype=np.float64)
 
                 # Normalize units
-                if variable == 'cloud_cover' and df['value'].max() <= 1.5:
-                    df['value'] = df['value'] * 100.0
-                if variable == 'snow_depth' and df['value'].max() < 1.0:
-                    df['value'] = df['value'] * 100.0  # dataset dependent; treat as cm
+                if variable == 'cloud_cover' and np.nanmax(values) <= 1.5:
+                    values = values * 100.0
+                if variable == 'snow_depth' and np.nanmax(values) < 1.0:
+                    values = values * 100.0  # dataset dependent; treat as cm
 
-                df[variable] = df['value']
-                return df
+                return _series_from_points(times, values)
         except Exception as e:
-            print(f"⚠️  OPeNDAP fetch failed for {variable}: {e}")
+            logger.warning("⚠️  OPeNDAP fetch failed for %s: %s", variable, e)
             # Continue to POWER/simulation
 
         # 3) Try NASA POWER for common variables (no auth required)
@@ -424,7 +667,7 @@ class NASADataProvider:
                     f"&latitude={lat}&longitude={lon}"
                     "&community=AG&format=JSON"
                 )
-                print(f"🛰️  Fetching NASA POWER {params} for {lat}, {lon}")
+                logger.debug("🛰️  Fetching NASA POWER %s for %s, %s", params, lat, lon)
                 async with aiohttp.ClientSession() as session:
                     async with session.get(url, timeout=60) as resp:
                         if resp.status != 200:
@@ -436,7 +679,7 @@ class NASADataProvider:
                 series = parameter.get(params, {})
                 if not series:
                     raise RuntimeError("POWER empty series")
-                # Build DataFrame
+                # Build daily series
                 dates = []
                 values = []
                 for datestr, val in series.items():
@@ -448,447 +691,263 @@ class NASADataProvider:
                         continue
                 if not dates:
                     raise RuntimeError("POWER parse produced no dates")
-                df = pd.DataFrame({
-                    'date': dates,
-                    'value': values,
-                    variable: values  # also expose canonical column
-                })
-                return df
-            except Exception as e:
-            print(f"⚠️  NASA POWER fetch failed for {variable}: {e}")
-                print("   Falling back to simulated data")
-        
-        # 4) Fallback to simulated data
-        print(f"🔬 Using simulated {variable} data for {lat}, {lon}")
-        dates = pd.date_range('1990-01-01', '2024-12-31', freq='D')
-        
-        # Seasonal patterns based on location
-        day_of_year = dates.dayofyear
-        latitude_factor = np.abs(lat) / 90.0
-        
-        if variable == "temperature":
-            # Temperature simulation with seasonal cycle
-            base_temp = 20 - (latitude_factor * 25)  # Warmer near equator
-            seasonal = 15 * np.sin(2 * np.pi * (day_of_year - 81) / 365)
-            noise = np.random.normal(0, 5, len(dates))
-            values = base_temp + seasonal + noise
-            
-        elif variable == "precipitation":
-            # Precipitation with monsoon patterns
-            monsoon_factor = 1 + np.sin(2 * np.pi * (day_of_year - 150) / 365)
-            if lat < 30:  # Tropical regions
-                monsoon_factor *= 2
-            base_precip = np.random.exponential(2, len(dates)) * monsoon_factor
-            values = np.maximum(0, base_precip)
-            
-        elif variable == "wind_speed":
-            # Wind speed with seasonal patterns
-            winter_boost = 1 + 0.5 * np.sin(2 * np.pi * (day_of_year - 365) / 365)
-            if latitude_factor > 0.5:  # Higher latitudes windier
-                winter_boost *= 1.5
-            values = np.random.gamma(2, 3) * winter_boost
-            
-        elif variable == "snow_depth":
-            # Snow depth depends strongly on latitude and season
-            months = dates.month
-            is_northern = lat >= 0
-            # Define winter months by hemisphere
-            winter_mask = (
-                ((months <= 3) | (months == 12)) if is_northern else ((months >= 6) & (months <= 9))
-            )
-            # Base potential snow only at higher latitudes
-            high_lat_factor = np.clip((np.abs(lat) - 35) / 25, 0, 1)  # 0 below 35°, 1 above 60°
-            # Minimal or zero snow for tropics/subtropics
-            tropical_mask = np.abs(lat) < 25
-            noise = np.random.gamma(1.5, 1.5, len(dates))
-            values = np.where(winter_mask, noise * 5 * high_lat_factor, 0.0)
-            if tropical_mask:
-                values = np.zeros(len(dates))
-            
-        elif variable == "air_quality":
-            # Air quality simulation (PM2.5 equivalent)
-            # Higher pollution in urban areas and during certain seasons
-            urban_factor = 1.5 if abs(lat) < 40 and abs(lon) < 100 else 1.0  # Urban areas
-            seasonal_pollution = 1 + 0.3 * np.sin(2 * np.pi * (day_of_year - 200) / 365)  # Winter pollution
-            base_pollution = np.random.gamma(1.5, 8) * urban_factor * seasonal_pollution
-            values = np.maximum(5, base_pollution)  # Minimum 5 μg/m³
-            
-        else:
-            values = np.random.normal(10, 3, len(dates))
+                return _series_from_points(np.array(dates, dtype='datetime64[D]'), values)
+        except Exception as e:
+            logger.warning("⚠️  NASA POWER fetch failed for %s: %s; falling back to simulated data", variable, e)
         
-        return pd.DataFrame({
-            'date': dates,
-            'value': values,
-            'variable': variable
-        })
+        # 4) Fallback to simulated data (cached per grid cell and variable)
+        logger.debug("🔬 Using simulated %s data for %s, %s", variable, lat, lon)
+        return _series(_build_sim(_quantize(lat), _quantize(lon), variable))
     
-    def _average_points(self, dfs: List[pd.DataFrame], variable: str) -> pd.DataFrame:
-        if not dfs:
-            return pd.DataFrame()
-        base = dfs[0][['date']].copy()
-        base['value'] = 0.0
-        for d in dfs:
-            m = d[['date', 'value']]
-            base = base.merge(m, on='date', how='left', suffixes=('', '_x'))
-            base['value'] = base['value'] + base['value_x'].fillna(base['value'])
-            base.drop(columns=['value_x'], inplace=True)
-        base['value'] = base['value'] / len(dfs)
-        base[variable] = base['value']
-        base['variable'] = variable
-        return base
+    def _average_points(self, series: List[HistoricalSeries]) -> HistoricalSeries:
+        """Average several series day by day, ignoring points without data"""
+        stacked = np.vstack([sr.values for sr in series])
+        valid = ~np.isnan(stacked)
+        with np.errstate(invalid='ignore'):
+            values = np.where(valid, stacked, 0.0).sum(axis=0) / valid.sum(axis=0)
+        return _series(values)
     
-    async def calculate_probabilities(self, lat: float, lon: float, event_date: str, thresholds: Dict, area_radius_km: float = 0.0, polygon: Optional[List[Dict[str, float]]] = None) -> List[WeatherProbability]:
+    async def fetch_inputs(self, lat: float, lon: float, area_radius_km: float = 0.0, polygon: Optional[List[Dict[str, float]]] = None) -> LocationInputs:
         """
-        Calculate weather probabilities based on historical data
+        Fetch live conditions and one historical series per variable for a location
         """
-        event_dt = datetime.fromisoformat(event_date)
-        month = event_dt.month
-        day = event_dt.day
-        
-        probabilities = []
-
         # Fetch live current conditions to sanity-check certain variables (prevents obviously wrong outputs)
-        current: Dict[str, Any] = {}
-        try:
-            import aiohttp
-            current_url = (
-                "https://api.open-meteo.com/v1/forecast"
-                f"?latitude={lat}&longitude={lon}"
-                "&current=precipitation,cloud_cover,wind_speed_10m,pm2_5,snowfall"
-                "&timezone=UTC"
-            )
-            async with aiohttp.ClientSession() as session:
-                async with session.get(current_url, timeout=20) as r:
-                    if r.status == 200:
-                        j = await r.json()
-                        current = j.get("current", {}) or {}
-        except Exception as _e:
-            current = {}
+        async def fetch_current() -> Dict[str, Any]:
+            try:
+                import aiohttp
+                current_url = (
+                    "https://api.open-meteo.com/v1/forecast"
+                    f"?latitude={lat}&longitude={lon}"
+                    "&current=precipitation,cloud_cover,wind_speed_10m,pm2_5,snowfall"
+                    "&timezone=UTC"
+                )
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(current_url, timeout=20) as r:
+                        if r.status == 200:
+                            j = await r.json()
+                            return j.get("current", {}) or {}
+            except Exception as _e:
+                pass
+            return {}
 
         # Helper: sample multiple points in a small grid within radius and average
-        async def sample_variable(variable: str) -> pd.DataFrame:
+        async def sample_variable(variable: str) -> HistoricalSeries:
             if polygon and len(polygon) >= 3:
                 # Sample polygon vertices and centroid
                 points = polygon + [{'lat': sum(p['lat'] for p in polygon)/len(polygon), 'lon': sum(p['lng'] for p in polygon)/len(polygon)}]
-                dfs = []
-                for p in points:
-                    d = await self.get_historical_data(p['lat'], p['lon'], variable)
-                    dfs.append(d)
-                return self._average_points(dfs, variable)
+                samples = await asyncio.gather(*[
+                    self.get_historical_data(p['lat'], p['lon'], variable) for p in points
+                ])
+                return self._average_points(samples)
             if area_radius_km and area_radius_km > 0:
                 # Build a simple 3x3 grid (~approx by degrees, 1 deg ~ 111km)
                 deg = float(area_radius_km) / 111.0
                 offsets = [-deg, 0.0, deg]
-                dfs = []
-                for dy in offsets:
-                    for dx in offsets:
-                        d = await self.get_historical_data(lat + dy, lon + dx, variable)
-                        dfs.append(d)
-                return self._average_points(dfs, variable)
+                samples = await asyncio.gather(*[
+                    self.get_historical_data(lat + dy, lon + dx, variable)
+                    for dy in offsets for dx in offsets
+                ])
+                return self._average_points(samples)
             else:
                 return await self.get_historical_data(lat, lon, variable)
         
-        # Temperature analysis
-        temp_data = await sample_variable("temperature")
-        temp_data['month'] = temp_data['date'].dt.month
-        temp_data['day'] = temp_data['date'].dt.day
+        # The fetches are independent (network I/O in real-data mode), so run them concurrently
+        try:
+            async with asyncio.TaskGroup() as tg:
+                current_task = tg.create_task(fetch_current())
+                series_tasks = {v: tg.create_task(sample_variable(v)) for v in HISTORY_VARIABLES}
+        except* Exception as group:
+            # Report the underlying failure, not the TaskGroup's ExceptionGroup wrapper
+            raise group.exceptions[0] from None
+        return current_task.result(), {v: task.result() for v, task in series_tasks.items()}
+    
+    def calculate_probabilities(self, inputs: LocationInputs, lat: float, dates: List[datetime], thresholds: Dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calculate weather probabilities based on historical data for several dates at once
+        Returns the reported (rounded) probabilities in percent and the historical means,
+        each (n_dates, n_conditions) ordered as COMFORT_CONDITIONS, from one window tensor
+        with the live-conditions sanity checks applied, and the trend slopes at dates[0]
+        """
+        current, series = inputs
+        probs, means, slopes = _window_matrix(series, dates, thresholds, self._trend_slopes)
+        hot, cold, rain, wind, air, cloud, snow, dust = range(len(COMFORT_CONDITIONS))
+        
+        # If it's currently raining above threshold, ensure probability isn't unrealistically low
+        if current.get("precipitation") is not None and current.get("precipitation", 0) > thresholds['precipitation']:
+            probs[:, rain] = np.maximum(probs[:, rain], 70.0)
         
-        # Filter for same date across years (±7 days window)
-        window_data = temp_data[
-            (temp_data['month'] == month) & 
-            (abs(temp_data['day'] - day) <= 7)
-        ]
+        # Live wind sanity check
+        live_wind = current.get("wind_speed_10m")
+        if live_wind is not None:
+            if live_wind > thresholds['wind_speed']:
+                probs[:, wind] = np.maximum(probs[:, wind], 60.0)
+            else:
+                probs[:, wind] = np.minimum(probs[:, wind], 20.0)
+        
+        # Override with live pm2_5 if present to avoid unrealistic 100%
+        live_pm25 = current.get("pm2_5")
+        if live_pm25 is not None:
+            probs[:, air] = 100.0 if live_pm25 > thresholds.get('air_quality', 25.0) else 0.0
+        
+        # Use live cloud cover sanity check
+        live_cloud = current.get("cloud_cover")
+        if live_cloud is not None:
+            if live_cloud >= thresholds.get('cloud_cover', 70.0):
+                probs[:, cloud] = np.maximum(probs[:, cloud], 90.0)
+            else:
+                probs[:, cloud] = np.minimum(probs[:, cloud], 10.0)
+        
+        # If location is tropical/subtropical, force snow probability to 0
+        if abs(lat) < 25:
+            probs[:, snow] = 0.0
+        else:
+            live_snowfall = current.get("snowfall")
+            if live_snowfall is not None and live_snowfall <= 0:
+                probs[:, snow] = np.minimum(probs[:, snow], 5.0)
         
-        # Determine the correct column name for temperature data
-        temp_column = 'temperature' if 'temperature' in window_data.columns else 'value'
+        return np.round(probs, 1), means, slopes
+    
+    def probabilities_for_date(self, thresholds: Dict, probs: np.ndarray, means: np.ndarray, slopes: np.ndarray) -> List[WeatherProbability]:
+        """
+        Per-condition probabilities for one date
+        probs/means are that date's row of calculate_probabilities and slopes
+        its trend slopes, all ordered as COMFORT_CONDITIONS
+        """
+        hot_prob, cold_prob, rain_prob, wind_prob, air_quality_prob, cloud_prob, snow_prob, dust_prob = probs.tolist()
+        temp_mean, _, precip_mean, wind_mean, air_quality_mean, cloud_mean, snow_mean, dust_mean = means.tolist()
+        # The cold row windows the same temperature series as the hot row
+        hot_trend_slope, _, rain_trend_slope, wind_trend_slope, air_quality_trend_slope, cloud_trend, snow_trend, dust_trend = slopes.tolist()
         
-        # Hot temperature probability
-        hot_prob = (window_data[temp_column] > thresholds['hot_temp']).mean() * 100
-        hot_trend_slope = self._calculate_trend(window_data, temp_column)
+        probabilities = []
         
+        # Temperature analysis
+        # Same date across years (±7 days window)
         probabilities.append(WeatherProbability(
             condition="Very Hot",
-            probability=round(hot_prob, 1),
+            probability=hot_prob,
             threshold=f">{thresholds['hot_temp']}°C",
             trend="increasing" if hot_trend_slope > 0.01 else "stable",
             confidence=0.85,
-            historical_mean=window_data[temp_column].mean(),
+            historical_mean=temp_mean,
             trend_slope=hot_trend_slope,
             p_value=0.04 if abs(hot_trend_slope) > 0.01 else 0.15
         ))
         
         # Cold temperature probability
-        cold_prob = (window_data[temp_column] < thresholds['cold_temp']).mean() * 100
         cold_trend_slope = -hot_trend_slope  # Inverse relationship
         
         probabilities.append(WeatherProbability(
             condition="Very Cold",
-            probability=round(cold_prob, 1),
+            probability=cold_prob,
             threshold=f"<{thresholds['cold_temp']}°C",
             trend="increasing" if cold_trend_slope > 0.01 else "stable",
             confidence=0.78,
-            historical_mean=window_data[temp_column].mean(),
+            historical_mean=temp_mean,
             trend_slope=cold_trend_slope,
             p_value=0.06 if abs(cold_trend_slope) > 0.01 else 0.20
         ))
         
         # Precipitation analysis
-        precip_data = await sample_variable("precipitation")
-        precip_data['month'] = precip_data['date'].dt.month
-        precip_data['day'] = precip_data['date'].dt.day
-        
-        precip_window = precip_data[
-            (precip_data['month'] == month) & 
-            (abs(precip_data['day'] - day) <= 7)
-        ]
-        
-        # Determine the correct column name for precipitation data
-        precip_column = 'precipitation' if 'precipitation' in precip_window.columns else 'value'
-        
-        rain_prob = (precip_window[precip_column] > thresholds['precipitation']).mean() * 100
-        rain_trend_slope = self._calculate_trend(precip_window, precip_column)
-        
-        # If it's currently raining above threshold, ensure probability isn't unrealistically low
-        if current.get("precipitation") is not None and current.get("precipitation", 0) > thresholds['precipitation']:
-            rain_prob = max(rain_prob, 70.0)
-        
         probabilities.append(WeatherProbability(
             condition="Heavy Rain",
-            probability=round(rain_prob, 1),
+            probability=rain_prob,
             threshold=f">{thresholds['precipitation']}mm",
             trend="increasing" if rain_trend_slope > 0.1 else "stable",
             confidence=0.72,
-            historical_mean=precip_window[precip_column].mean(),
+            historical_mean=precip_mean,
             trend_slope=rain_trend_slope,
             p_value=0.01 if abs(rain_trend_slope) > 0.1 else 0.25
         ))
         
         # Wind analysis
-        wind_data = await sample_variable("wind_speed")
-        wind_data['month'] = wind_data['date'].dt.month
-        wind_data['day'] = wind_data['date'].dt.day
-        
-        wind_window = wind_data[
-            (wind_data['month'] == month) & 
-            (abs(wind_data['day'] - day) <= 7)
-        ]
-        
-        # Determine the correct column name for wind data
-        wind_column = 'wind_speed' if 'wind_speed' in wind_window.columns else 'value'
-        
-        wind_prob = (wind_window[wind_column] > thresholds['wind_speed']).mean() * 100
-        wind_trend_slope = self._calculate_trend(wind_window, wind_column)
-        
-        # Live wind sanity check
-        live_wind = current.get("wind_speed_10m")
-        if live_wind is not None:
-            if live_wind > thresholds['wind_speed']:
-                wind_prob = max(wind_prob, 60.0)
-            else:
-                wind_prob = min(wind_prob, 20.0)
-        
         probabilities.append(WeatherProbability(
             condition="Strong Wind",
-            probability=round(wind_prob, 1),
+            probability=wind_prob,
             threshold=f">{thresholds['wind_speed']}m/s",
             trend="stable",
             confidence=0.65,
-            historical_mean=wind_window[wind_column].mean(),
+            historical_mean=wind_mean,
             trend_slope=wind_trend_slope,
             p_value=0.30
         ))
         
         # Air Quality Analysis (using MERRA-2 aerosol data)
-        air_quality_data = await sample_variable("air_quality")
-        air_quality_data['month'] = air_quality_data['date'].dt.month
-        air_quality_data['day'] = air_quality_data['date'].dt.day
-        
-        air_quality_window = air_quality_data[
-            (air_quality_data['month'] == month) & 
-            (abs(air_quality_data['day'] - day) <= 7)
-        ]
-        
-        # Determine the correct column name for air quality data
-        air_quality_column = 'air_quality' if 'air_quality' in air_quality_window.columns else 'value'
-        
         # Air quality threshold (PM2.5 equivalent > 25 μg/m³)
         air_quality_threshold = thresholds.get('air_quality', 25.0)
-        air_quality_prob = (air_quality_window[air_quality_column] > air_quality_threshold).mean() * 100
-        air_quality_trend_slope = self._calculate_trend(air_quality_window, air_quality_column)
-        
-        # Override with live pm2_5 if present to avoid unrealistic 100%
-        live_pm25 = current.get("pm2_5")
-        if live_pm25 is not None:
-            air_quality_prob = 100.0 if live_pm25 > air_quality_threshold else 0.0
-        
         probabilities.append(WeatherProbability(
             condition="Poor Air Quality",
-            probability=round(air_quality_prob, 1),
+            probability=air_quality_prob,
             threshold=f">{air_quality_threshold}μg/m³",
             trend="increasing" if air_quality_trend_slope > 0.1 else "stable",
             confidence=0.70,
-            historical_mean=air_quality_window[air_quality_column].mean(),
+            historical_mean=air_quality_mean,
             trend_slope=air_quality_trend_slope,
             p_value=0.08 if abs(air_quality_trend_slope) > 0.1 else 0.25
         ))
         
         # Additional variables (placeholder simulations until real dataset enabled)
         # Cloud Cover
-        cloud_data = await sample_variable("cloud_cover")
-        cloud_data['month'] = cloud_data['date'].dt.month
-        cloud_data['day'] = cloud_data['date'].dt.day
-        cloud_window = cloud_data[(cloud_data['month'] == month) & (abs(cloud_data['day'] - day) <= 7)]
-        cloud_column = 'cloud_cover' if 'cloud_cover' in cloud_window.columns else 'value'
         cloud_threshold = thresholds.get('cloud_cover', 70.0)
-        cloud_prob = (cloud_window[cloud_column] > cloud_threshold).mean() * 100
-        # Use live cloud cover sanity check
-        live_cloud = current.get("cloud_cover")
-        if live_cloud is not None:
-            cloud_prob = max(cloud_prob, 90.0) if live_cloud >= cloud_threshold else min(cloud_prob, 10.0)
-        cloud_trend = self._calculate_trend(cloud_window, cloud_column)
         probabilities.append(WeatherProbability(
             condition="Cloudy Day",
-            probability=round(cloud_prob, 1),
+            probability=cloud_prob,
             threshold=f">{cloud_threshold}%",
             trend="increasing" if cloud_trend > 0.05 else "stable",
             confidence=0.6,
-            historical_mean=cloud_window[cloud_column].mean(),
+            historical_mean=cloud_mean,
             trend_slope=cloud_trend,
             p_value=0.12
         ))
 
         # Snow Depth (respect latitude; skip if not relevant)
-        snow_data = await sample_variable("snow_depth")
-        snow_data['month'] = snow_data['date'].dt.month
-        snow_data['day'] = snow_data['date'].dt.day
-        snow_window = snow_data[(snow_data['month'] == month) & (abs(snow_data['day'] - day) <= 7)]
-        snow_column = 'snow_depth' if 'snow_depth' in snow_window.columns else 'value'
         snow_threshold = thresholds.get('snow_depth', 5.0)
-        # If location is tropical/subtropical, force probability to 0
-        if abs(lat) < 25:
-            snow_prob = 0.0
-        else:
-            snow_prob = (snow_window[snow_column] > snow_threshold).mean() * 100
-            live_snowfall = current.get("snowfall")
-            if live_snowfall is not None and live_snowfall <= 0:
-                snow_prob = min(snow_prob, 5.0)
-        snow_trend = self._calculate_trend(snow_window, snow_column)
         probabilities.append(WeatherProbability(
             condition="Snow Depth",
-            probability=round(snow_prob, 1),
+            probability=snow_prob,
             threshold=f">{snow_threshold}cm",
             trend="increasing" if snow_trend > 0.05 else "stable",
             confidence=0.55,
-            historical_mean=snow_window[snow_column].mean(),
+            historical_mean=snow_mean,
             trend_slope=snow_trend,
             p_value=0.18
         ))
 
         # Dust/Aerosol
-        dust_data = await sample_variable("dust")
-        dust_data['month'] = dust_data['date'].dt.month
-        dust_data['day'] = dust_data['date'].dt.day
-        dust_window = dust_data[(dust_data['month'] == month) & (abs(dust_data['day'] - day) <= 7)]
-        dust_column = 'dust' if 'dust' in dust_window.columns else 'value'
         dust_threshold = thresholds.get('dust', 0.2)  # AOD placeholder
-        dust_prob = (dust_window[dust_column] > dust_threshold).mean() * 100
-        dust_trend = self._calculate_trend(dust_window, dust_column)
         probabilities.append(WeatherProbability(
             condition="Dust Concentration",
-            probability=round(dust_prob, 1),
+            probability=dust_prob,
             threshold=f">{dust_threshold} AOD",
             trend="increasing" if dust_trend > 0.02 else "stable",
             confidence=0.5,
-            historical_mean=dust_window[dust_column].mean(),
+            historical_mean=dust_mean,
             trend_slope=dust_trend,
             p_value=0.2
         ))
         
         return probabilities
     
-    def _calculate_trend(self, data: pd.DataFrame, column: str) -> float:
-        """Calculate linear trend slope"""
-        if len(data) < 10:
-            return 0.0
-        
-        data = data.copy()
-        data['year'] = data['date'].dt.year
-        yearly_means = data.groupby('year')[column].mean()
-        
-        if len(yearly_means) < 3:
-            return 0.0
-        
-        # Simple linear regression with overflow protection
-        years = yearly_means.index.values.astype(np.float64)
-        values = yearly_means.values.astype(np.float64)
-        
-        n = len(years)
-        sum_x = np.sum(years)
-        sum_y = np.sum(values)
-        sum_xy = np.sum(years * values)
-        sum_x2 = np.sum(years ** 2)
-        
-        denominator = n * sum_x2 - sum_x ** 2
-        if abs(denominator) < 1e-10:  # Avoid division by zero
-            return 0.0
-            
-        slope = (n * sum_xy - sum_x * sum_y) / denominator
-        
-        # Clamp slope to reasonable range to avoid overflow
-        return np.clip(slope, -1000, 1000)
-
-    def calculate_comfort_index(self, probabilities: List[WeatherProbability]) -> int:
+    def calculate_comfort_index(self, probs: np.ndarray) -> int:
         """
         Calculate weighted comfort index (0-100) as specified in PRD
         Combines multiple weather conditions with personalized weights
+        probs are the reported probabilities ordered as COMFORT_CONDITIONS
+        (a row of calculate_probabilities)
         """
-        # Enhanced weights based on PRD requirements for "Very Uncomfortable" conditions
-        weights = {
-            'Very Hot': 0.30,      # High weight for extreme heat
-            'Very Cold': 0.20,     # Moderate weight for cold
-            'Heavy Rain': 0.25,    # High weight for precipitation
-            'Strong Wind': 0.10,   # Lower weight for wind
-            'Poor Air Quality': 0.10,  # Air quality impact
-            'High Humidity': 0.05  # Additional factor for humidity
-        }
-        
-        # Calculate weighted discomfort score
-        discomfort = 0
-        total_weight = 0
-        
-        for prob in probabilities:
-            weight = weights.get(prob.condition, 0.05)  # Default weight for unknown conditions
-            # Apply non-linear scaling for extreme probabilities
-            scaled_prob = prob.probability / 100
-            if scaled_prob > 0.5:  # Penalize high probabilities more heavily
-                scaled_prob = scaled_prob ** 1.5
-            
-            discomfort += scaled_prob * weight
-            total_weight += weight
-        
-        # Normalize by total weight
-        if total_weight > 0:
-            discomfort = discomfort / total_weight
-        
-        # Convert to comfort score (0-100)
-        # Higher discomfort = lower comfort
-        comfort = max(0, min(100, round((1 - discomfort) * 100)))
-        
-        return comfort
+        return int(_comfort_index(probs, COMFORT_WEIGHT_VECTOR))
     
-    async def suggest_alternative_dates(self, lat: float, lon: float, event_date: str, thresholds: Dict) -> List[Dict]:
+    def suggest_alternative_dates(self, event_dt: datetime, alt_dates: List[datetime], alt_probs: np.ndarray) -> List[Dict]:
         """
         Suggest 3 alternative dates with better weather prospects
+        alt_probs are the calculate_probabilities rows for alt_dates
         """
-        event_dt = datetime.fromisoformat(event_date)
         alternatives = []
         
-        # Check dates ±14 days around event date
-        for offset in [-14, -7, 7, 14]:
-            alt_date = event_dt + timedelta(days=offset)
-            alt_probs = await self.calculate_probabilities(lat, lon, alt_date.isoformat(), thresholds)
-            alt_comfort = self.calculate_comfort_index(alt_probs)
-            
+        # Score every date at once
+        alt_comforts = _comfort_index(alt_probs, COMFORT_WEIGHT_VECTOR).tolist()
+        offsets = [(alt_date - event_dt).days for alt_date in alt_dates]
+        
+        for offset, alt_date, alt_comfort in zip(offsets, alt_dates, alt_comforts):
             alternatives.append({
                 'date': alt_date.isoformat(),
                 'comfort_index': alt_comfort,
@@ -900,76 +959,186 @@ class NASADataProvider:
         alternatives.sort(key=lambda x: x['comfort_index'], reverse=True)
         return alternatives[:3]
 
-# Initialize NASA data provider
-nasa_data = NASADataProvider()
+# NASA data provider, created on first use
+_nasa_data: Optional[NASADataProvider] = None
+_nasa_data_lock = asyncio.Lock()
+
+async def get_nasa_data() -> NASADataProvider:
+    """Return the shared NASADataProvider, creating it on the first request that needs it"""
+    global _nasa_data
+    if _nasa_data is None:
+        async with _nasa_data_lock:
+            if _nasa_data is None:
+                _nasa_data = NASADataProvider()
+    return _nasa_data
 
 @app.get("/")
 async def root():
     return {
         "message": "Will It Rain On My Parade? - NASA Weather Risk API",
-        "datasets": nasa_data.datasets,
+        "datasets": NASA_DATASETS,
         "endpoints": ["/analyze", "/health"]
     }
 
+async def run_analysis(nasa_data: NASADataProvider, request: LocationRequest, inputs: Optional[LocationInputs] = None) -> WeatherAnalysisResponse:
+    """
+    Full weather risk analysis for one request
+    Pass inputs (from fetch_inputs) to reuse data already fetched for the location
+    """
+    logger.info("🔍 Analyzing weather risk for %s, %s on %s", request.latitude, request.longitude, request.event_date)
+    logger.debug("   Thresholds: %s", request.thresholds)
+    
+    # One fetch serves the event date and the alternative dates
+    if inputs is None:
+        inputs = await nasa_data.fetch_inputs(request.latitude, request.longitude, request.area_radius_km or 0.0, request.polygon)
+    
+    # Every date is reduced in one window tensor: row 0 is the event date,
+    # the rest are the candidate alternative dates
+    event_dt = datetime.fromisoformat(request.event_date)
+    alt_dates = [event_dt + timedelta(days=offset) for offset in ALTERNATIVE_DATE_OFFSETS]
+    probs, means, slopes = nasa_data.calculate_probabilities(inputs, request.latitude, [event_dt] + alt_dates, request.thresholds)
+    
+    probabilities = nasa_data.probabilities_for_date(request.thresholds, probs[0], means[0], slopes)
+    logger.debug("✅ Calculated %d probability conditions", len(probabilities))
+    
+    # Calculate comfort index
+    comfort_index = nasa_data.calculate_comfort_index(probs[0])
+    logger.debug("✅ Comfort index: %d%%", comfort_index)
+    
+    # Get alternative dates
+    alternatives = nasa_data.suggest_alternative_dates(event_dt, alt_dates, probs[1:])
+    logger.debug("✅ Found %d alternative dates", len(alternatives))
+    
+    response = WeatherAnalysisResponse(
+        location={
+            "latitude": request.latitude,
+            "longitude": request.longitude
+        },
+        event_date=request.event_date,
+        comfort_index=comfort_index,
+        probabilities=probabilities,
+        alternative_dates=alternatives,
+        metadata={
+            "datasets_used": ["NASA POWER (T2M, PRECTOTCORR, WS10M)", "MERRA-2 (optional)", "GPM IMERG (optional)"],
+            "years_analyzed": "1990-2024",
+            "analysis_date": datetime.now().isoformat(),
+            "confidence_level": "85%",
+            "data_window": "±7 days"
+        }
+    )
+    
+    logger.info("✅ Weather analysis completed (comfort index %d%%)", comfort_index)
+    return response
+
+class AnalysisBatcher:
+    """
+    Dynamic batching for /analyze
+    Requests arriving within max_delay of each other (up to max_batch_size) are
+    grouped by location and area, and each group shares one data fetch.
+    """
+    
+    def __init__(self, max_batch_size: int = 16, max_delay: float = 0.05):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._groups: set = set()  # in-flight group tasks (keep references)
+    
+    def start(self):
+        """Start the consumer task on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def submit(self, request: LocationRequest) -> WeatherAnalysisResponse:
+        # Started lazily as well, for runtimes that skip the lifespan events
+        # (or run each invocation on a fresh event loop)
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not asyncio.get_running_loop():
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+    
+    @staticmethod
+    def _group_key(request: LocationRequest) -> Tuple:
+        # Keyed on the exact coordinates the shared fetch uses: real-data providers and the
+        # live-conditions lookup are queried per point, so nearby requests cannot share them
+        polygon = tuple(tuple(sorted(p.items())) for p in request.polygon) if request.polygon else None
+        return (request.latitude, request.longitude, request.area_radius_km or 0.0, polygon)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            groups: Dict[Tuple, List[Tuple[LocationRequest, asyncio.Future]]] = {}
+            for request, future in batch:
+                # A request that cannot be grouped fails on its own, without stopping the worker
+                try:
+                    key = self._group_key(request)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                groups.setdefault(key, []).append((request, future))
+            if len(batch) > 1:
+                logger.debug("📦 Batched %d analyze requests into %d fetch groups", len(batch), len(groups))
+            for items in groups.values():
+                task = asyncio.create_task(self._serve_group(items))
+                self._groups.add(task)
+                task.add_done_callback(self._groups.discard)
+    
+    async def _serve_group(self, items: List[Tuple[LocationRequest, asyncio.Future]]):
+        try:
+            nasa_data = await get_nasa_data()
+            first = items[0][0]
+            inputs = await nasa_data.fetch_inputs(first.latitude, first.longitude, first.area_radius_km or 0.0, first.polygon)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for request, future in items:
+            if future.done():  # client went away
+                continue
+            try:
+                future.set_result(await run_analysis(nasa_data, request, inputs))
+            except Exception as e:
+                future.set_exception(e)
+
+analysis_batcher = AnalysisBatcher(
+    max_batch_size=int(os.getenv("ANALYZE_MAX_BATCH_SIZE", "16")),
+    max_delay=float(os.getenv("ANALYZE_MAX_BATCH_DELAY", "0.05"))
+)
+
 @app.post("/analyze", response_model=WeatherAnalysisResponse)
 async def analyze_weather_risk(request: LocationRequest):
     """
     Main endpoint for weather risk analysis
     """
     try:
-        print(f"🔍 Analyzing weather risk for {request.latitude}, {request.longitude} on {request.event_date}")
-        print(f"   Thresholds: {request.thresholds}")
-        
-        # Calculate probabilities using NASA data
-        probabilities = await nasa_data.calculate_probabilities(
-            request.latitude, 
-            request.longitude, 
-            request.event_date, 
-            request.thresholds,
-            request.area_radius_km or 0.0,
-            request.polygon
-        )
-        print(f"✅ Calculated {len(probabilities)} probability conditions")
-        
-        # Calculate comfort index
-        comfort_index = nasa_data.calculate_comfort_index(probabilities)
-        print(f"✅ Comfort index: {comfort_index}%")
-        
-        # Get alternative dates
-        alternatives = await nasa_data.suggest_alternative_dates(
-            request.latitude,
-            request.longitude, 
-            request.event_date,
-            request.thresholds
-        )
-        print(f"✅ Found {len(alternatives)} alternative dates")
-        
-        response = WeatherAnalysisResponse(
-            location={
-                "latitude": request.latitude,
-                "longitude": request.longitude
-            },
-            event_date=request.event_date,
-            comfort_index=comfort_index,
-            probabilities=probabilities,
-            alternative_dates=alternatives,
-            metadata={
-                "datasets_used": ["NASA POWER (T2M, PRECTOTCORR, WS10M)", "MERRA-2 (optional)", "GPM IMERG (optional)"],
-                "years_analyzed": "1990-2024",
-                "analysis_date": datetime.now().isoformat(),
-                "confidence_level": "85%",
-                "data_window": "±7 days"
-            }
-        )
-        
-        print("✅ Weather analysis completed successfully")
-        return response
-    
+        return await analysis_batcher.submit(request)
     except Exception as e:
         error_msg = f"Analysis failed: {str(e)}"
-        print(f"❌ {error_msg}")
-        import traceback
-        print(f"   Traceback: {traceback.format_exc()}")
+        logger.exception("❌ %s", error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
 @app.get("/health")
@@ -977,11 +1146,11 @@ async def health_check():
     return {"status": "healthy", "nasa_datasets": "connected"}
 
 @app.get("/nasa-status")
-async def get_nasa_status():
+async def get_nasa_status(nasa_data: NASADataProvider = Depends(get_nasa_data)):
     """
     Check NASA API connection status
     """
-    if not NASA_INTEGRATION_AVAILABLE:
+    if not nasa_data.integration_available:
         return {
             "status": "unavailable",
             "message": "NASA integration module not available",
@@ -1016,7 +1185,7 @@ async def get_nasa_status():
         }
 
 @app.get("/opendap-status")
-async def opendap_status():
+async def opendap_status(nasa_data: NASADataProvider = Depends(get_nasa_data)):
     return {
         "enabled": nasa_data.opendap_enabled,
         "url": nasa_data.opendap_url,
@@ -1027,66 +1196,82 @@ async def opendap_status():
         }
         }
 
+# /data-sources payload
+# Only the live timestamp and the NASA status vary, so the rest is built once here
+DATA_SOURCE_CURRENT_WEATHER = {
+    "name": "Current Weather",
+    "status": "real",
+    "provider": "Open-Meteo API (ECMWF)",
+    "description": "Real-time meteorological data",
+    "api_endpoint": "api.open-meteo.com"
+}
+
+def _historical_data_sources(nasa_status: str) -> List[Dict[str, str]]:
+    """Historical data source entries for a NASA status ("real" or "simulated")"""
+    return [
+        {
+            "name": "Historical Temperature Analysis", 
+            "status": nasa_status,
+            "provider": "NASA MERRA-2 (Real)" if nasa_status == "real" else "Climatological Simulation (NASA MERRA-2 structure)",
+            "description": "Historical temperature patterns from NASA MERRA-2" if nasa_status == "real" else "Realistic but simulated historical temperature patterns",
+            "api_endpoint": "NASA Giovanni/OPeNDAP" if nasa_status == "real" else "localhost:8000 (simulated)",
+            "note": "Using real NASA data!" if nasa_status == "real" else "Set NASA credentials to enable real data"
+        },
+        {
+            "name": "Precipitation Probabilities",
+            "status": nasa_status, 
+            "provider": "NASA GPM IMERG (Real)" if nasa_status == "real" else "Climatological Simulation (NASA GPM IMERG structure)",
+            "description": "Historical precipitation patterns from NASA GPM IMERG" if nasa_status == "real" else "Realistic but simulated precipitation patterns",
+            "api_endpoint": "NASA Giovanni/OPeNDAP" if nasa_status == "real" else "localhost:8000 (simulated)",
+            "note": "Using real NASA data!" if nasa_status == "real" else "Set NASA credentials to enable real data"
+        },
+        {
+            "name": "Wind Speed Analysis",
+            "status": nasa_status,
+            "provider": "NASA MERRA-2 (Real)" if nasa_status == "real" else "Climatological Simulation (MERRA-2 structure)", 
+            "description": "Historical wind patterns from NASA MERRA-2" if nasa_status == "real" else "Realistic but simulated wind patterns",
+            "api_endpoint": "NASA Giovanni/OPeNDAP" if nasa_status == "real" else "localhost:8000 (simulated)",
+            "note": "Using real NASA data!" if nasa_status == "real" else "Set NASA credentials to enable real data"
+        }
+    ]
+
+HISTORICAL_DATA_SOURCES = {status: _historical_data_sources(status) for status in ("real", "simulated")}
+
+DATA_SOURCES_VERIFICATION = {
+    "real_data_sources": 1,
+    "simulated_data_sources": 3,
+    "total_sources": 4,
+    "nasa_integration_status": "development_mode",
+    "how_to_enable_real_nasa_data": [
+        "1. Register at earthdata.nasa.gov",
+        "2. Get API credentials",
+        "3. Set NASA_EARTHDATA_USERNAME and NASA_EARTHDATA_PASSWORD env vars",
+        "4. Replace simulation functions with OPeNDAP API calls",
+        "5. Install xarray and netCDF4 packages"
+    ]
+}
+
+DATA_SOURCES_DISCLAIMER = "This is a NASA Space Apps Challenge demonstration. Historical analysis uses realistic climatological patterns but is simulated for demo purposes. Current weather data is real."
+
 @app.get("/data-sources")
-async def get_data_sources():
+async def get_data_sources(nasa_data: NASADataProvider = Depends(get_nasa_data)):
     """
     Endpoint to verify which data sources are real vs simulated
     """
     # Check NASA status
     nasa_status = "simulated"
-    if NASA_INTEGRATION_AVAILABLE and nasa_data.use_real_nasa_data:
+    if nasa_data.integration_available and nasa_data.use_real_nasa_data:
         nasa_status = "real"
     
-    return {
+    # Plain JSON content, so it is handed to orjson directly instead of going through jsonable_encoder
+    return OrjsonContentResponse({
         "data_sources": [
-            {
-                "name": "Current Weather",
-                "status": "real",
-                "provider": "Open-Meteo API (ECMWF)",
-                "description": "Real-time meteorological data",
-                "api_endpoint": "api.open-meteo.com",
-                "last_updated": datetime.now().isoformat()
-            },
-            {
-                "name": "Historical Temperature Analysis", 
-                "status": nasa_status,
-                "provider": "NASA MERRA-2 (Real)" if nasa_status == "real" else "Climatological Simulation (NASA MERRA-2 structure)",
-                "description": "Historical temperature patterns from NASA MERRA-2" if nasa_status == "real" else "Realistic but simulated historical temperature patterns",
-                "api_endpoint": "NASA Giovanni/OPeNDAP" if nasa_status == "real" else "localhost:8000 (simulated)",
-                "note": "Using real NASA data!" if nasa_status == "real" else "Set NASA credentials to enable real data"
-            },
-            {
-                "name": "Precipitation Probabilities",
-                "status": nasa_status, 
-                "provider": "NASA GPM IMERG (Real)" if nasa_status == "real" else "Climatological Simulation (NASA GPM IMERG structure)",
-                "description": "Historical precipitation patterns from NASA GPM IMERG" if nasa_status == "real" else "Realistic but simulated precipitation patterns",
-                "api_endpoint": "NASA Giovanni/OPeNDAP" if nasa_status == "real" else "localhost:8000 (simulated)",
-                "note": "Using real NASA data!" if nasa_status == "real" else "Set NASA credentials to enable real data"
-            },
-            {
-                "name": "Wind Speed Analysis",
-                "status": nasa_status,
-                "provider": "NASA MERRA-2 (Real)" if nasa_status == "real" else "Climatological Simulation (MERRA-2 structure)", 
-                "description": "Historical wind patterns from NASA MERRA-2" if nasa_status == "real" else "Realistic but simulated wind patterns",
-                "api_endpoint": "NASA Giovanni/OPeNDAP" if nasa_status == "real" else "localhost:8000 (simulated)",
-                "note": "Using real NASA data!" if nasa_status == "real" else "Set NASA credentials to enable real data"
-            }
+            {**DATA_SOURCE_CURRENT_WEATHER, "last_updated": datetime.now().isoformat()},
+            *HISTORICAL_DATA_SOURCES[nasa_status]
         ],
-        "verification": {
-            "real_data_sources": 1,
-            "simulated_data_sources": 3,
-            "total_sources": 4,
-            "nasa_integration_status": "development_mode",
-            "how_to_enable_real_nasa_data": [
-                "1. Register at earthdata.nasa.gov",
-                "2. Get API credentials",
-                "3. Set NASA_EARTHDATA_USERNAME and NASA_EARTHDATA_PASSWORD env vars",
-                "4. Replace simulation functions with OPeNDAP API calls",
-                "5. Install xarray and netCDF4 packages"
-            ]
-        },
-        "disclaimer": "This is a NASA Space Apps Challenge demonstration. Historical analysis uses realistic climatological patterns but is simulated for demo purposes. Current weather data is real."
-    }
+        "verification": DATA_SOURCES_VERIFICATION,
+        "disclaimer": DATA_SOURCES_DISCLAIMER
+    })
 
 if __name__ == "__main__":
     import uvicorn
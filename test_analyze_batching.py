@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Regression tests for /analyze and its request batcher
+Runs in-process against the ASGI app with simulated data (no server or network needed)
+"""
+
+import asyncio
+import sys
+
+sys.path.append('backend')
+
+import httpx
+import numpy as np
+import main
+
+VALID_REQUEST = {
+    "latitude": 40.7128,
+    "longitude": -74.0060,
+    "event_date": "2025-07-04"
+}
+
+class SimulatedProvider(main.NASADataProvider):
+    """Provider that serves the simulated climatology without any network calls"""
+
+    def __init__(self, missing=()):
+        super().__init__()
+        self.fetched = []
+        self.missing = missing
+
+    async def fetch_inputs(self, lat, lon, area_radius_km=0.0, polygon=None):
+        self.fetched.append((lat, lon))
+        series = {
+            v: main._series(main._build_sim(main._quantize(lat), main._quantize(lon), v))
+            for v in main.HISTORY_VARIABLES
+        }
+        # Variables listed in `missing` have no historical samples at all
+        for v in self.missing:
+            series[v] = main._series(np.full(len(main.HISTORY_DATES), np.nan))
+        return {}, series
+
+def use_simulated_provider(**kwargs):
+    main._nasa_data = SimulatedProvider(**kwargs)
+    return main._nasa_data
+
+def test_non_finite_coordinates_rejected():
+    """A NaN latitude batched with a valid request is rejected without hanging the valid one"""
+    use_simulated_provider()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            bad = client.post(
+                "/analyze",
+                content='{"latitude": NaN, "longitude": -74.0, "event_date": "2025-07-04"}',
+                headers={"Content-Type": "application/json"}
+            )
+            good = client.post("/analyze", json=VALID_REQUEST)
+            return await asyncio.wait_for(asyncio.gather(bad, good), timeout=10)
+
+    bad, good = asyncio.run(run())
+    assert bad.status_code == 422, bad.text
+    assert good.status_code == 200, good.text
+
+def test_group_key_failure_only_fails_that_request():
+    """An exception while grouping fails only that request's future; the worker keeps serving"""
+    use_simulated_provider()
+
+    async def run():
+        batcher = main.AnalysisBatcher(max_delay=0.05)
+        group_key = batcher._group_key
+
+        def failing_group_key(request):
+            if request.event_date == "2025-07-05":
+                raise ValueError("cannot group request")
+            return group_key(request)
+
+        batcher._group_key = failing_group_key
+        try:
+            bad = batcher.submit(main.LocationRequest(**dict(VALID_REQUEST, event_date="2025-07-05")))
+            good = batcher.submit(main.LocationRequest(**VALID_REQUEST))
+            results = await asyncio.wait_for(asyncio.gather(bad, good, return_exceptions=True), timeout=10)
+            # The worker survived and still serves later batches
+            later = await asyncio.wait_for(batcher.submit(main.LocationRequest(**VALID_REQUEST)), timeout=10)
+            return results, later
+        finally:
+            await batcher.stop()
+
+    (bad, good), later = asyncio.run(run())
+    assert isinstance(bad, ValueError), bad
+    assert isinstance(good, main.WeatherAnalysisResponse), good
+    assert isinstance(later, main.WeatherAnalysisResponse), later
+
+def test_nearby_requests_fetch_their_own_coordinates():
+    """Requests in the same simulation cell but at different points never share a fetch"""
+    provider = use_simulated_provider()
+    nearby = dict(VALID_REQUEST, latitude=VALID_REQUEST["latitude"] + 0.05)
+
+    async def run():
+        batcher = main.AnalysisBatcher(max_delay=0.05)
+        try:
+            return await asyncio.wait_for(asyncio.gather(*[
+                batcher.submit(main.LocationRequest(**r)) for r in (VALID_REQUEST, nearby, VALID_REQUEST)
+            ]), timeout=10)
+        finally:
+            await batcher.stop()
+
+    asyncio.run(run())
+    # Identical requests share one fetch; the nearby point gets its own
+    assert sorted(provider.fetched) == sorted({
+        (VALID_REQUEST["latitude"], VALID_REQUEST["longitude"]),
+        (nearby["latitude"], nearby["longitude"])
+    }), provider.fetched
+
+def test_empty_window_scores_finite():
+    """A variable with no samples in the window reports 0% and keeps the comfort index in range"""
+    use_simulated_provider(missing=("air_quality",))
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.wait_for(client.post("/analyze", json=VALID_REQUEST), timeout=10)
+
+    response = asyncio.run(run())
+    assert response.status_code == 200, response.text
+    result = response.json()
+    air_quality = next(p for p in result["probabilities"] if p["condition"] == "Poor Air Quality")
+    assert air_quality["probability"] == 0, air_quality
+    assert air_quality["historical_mean"] == 0, air_quality
+    assert 0 <= result["comfort_index"] <= 100, result["comfort_index"]
+    assert all(0 <= alt["comfort_index"] <= 100 for alt in result["alternative_dates"]), result["alternative_dates"]
+
+if __name__ == "__main__":
+    for test in (test_non_finite_coordinates_rejected, test_group_key_failure_only_fails_that_request,
+                 test_nearby_requests_fetch_their_own_coordinates, test_empty_window_scores_finite):
+        test()
+        print(f"✅ {test.__name__}")
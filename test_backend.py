@@ -39,8 +39,11 @@ try:
     app = main.app
     print("✅ FastAPI app created successfully")
     
-    # Test NASA data provider
-    nasa_data = main.nasa_data
+    # Test NASA data provider (created lazily on the first request that needs it)
+    if main._nasa_data is not None:
+        raise RuntimeError("NASA data provider was created at import time")
+    import asyncio
+    nasa_data = asyncio.run(main.get_nasa_data())
     print(f"✅ NASA data provider initialized (real data: {nasa_data.use_real_nasa_data})")
     
     print("\n🎉 Backend test completed successfully!")